@@ -1,45 +1,8 @@
 import logging
+from functools import lru_cache
 from sys import exit
 import random
 
-def _gf2_add(bit1, bit2):
-    # Mod2 addition = XOR
-    return int(bool(bit1) != bool(bit2))
-
-def _gf2_mul(bit1, bit2):
-    # Mod2 multiplication = AND
-    return int(bool(bit1) and bool(bit2))
-
-def _mul_vec_mat(vector, matrix):
-    # The matrix must have the same number of rows as the vector's length
-    if len(vector) != len(matrix):
-        raise ValueError("Wrong dimensions! Vector length %d must be the same as matrix rows %d" % (len(vector), len(matrix)))
-    
-    result = [0] * len(matrix[0])
-
-    matrix_rows_to_xor = [row for (idx, row) in enumerate(matrix) if vector[idx] == 1]
-    #print("Matrix rows to XOR: %s" % matrix_rows_to_xor)
-
-    for (colidx, elem) in enumerate(matrix[0]):
-        for row in matrix_rows_to_xor:
-            result[colidx] = _gf2_add(result[colidx], row[colidx])
-        
-    return result
-
-def _mul_mat_vec(matrix, vector):
-    # Matrix x Vector multiplication
-
-    # The matrix must have the same number of cols than the vector's rows
-    if len(matrix[0]) != len(vector):
-        raise ValueError("Wrong dimensions! Vector length {} must be the same as matrix columns {}".format(len(vector), len(matrix[0])))
-
-    result = [0] * len(matrix)
-    for (rowidx, row) in enumerate(matrix):
-        for (colidx, col) in enumerate(row):
-            result[rowidx] = _gf2_add(result[rowidx], _gf2_mul(col, vector[colidx]))
-    
-    return result
-
 # One possible generator matrix for Hamming(7,4)
 # This moves the 3 parity bits to the front of the codeword
 _GENERATOR_3 = [
@@ -92,83 +55,191 @@ PARITY_CHECK_4 = [
 ] 
 
 
-def hamming_encode(message):
-    # Encoding is simply multiplying the message with the generator matrix
+def _pack_rows(matrix):
+    # Pack every row of a 0/1 matrix into an int, first column = MSB
+    packed = []
+    for row in matrix:
+        value = 0
+        for bit in row:
+            value = (value << 1) | bit
+        packed.append(value)
+    return tuple(packed)
+#
+
+# The parity check matrices packed into integers, one int per row, with 
+# the leftmost matrix column as the most significant bit. This is the form
+# the decoder computes with, the lists above are kept as the readable 
+# definition of the code. Messages, codewords and syndromes are packed
+# the same way (first bit = MSB), so a syndrome bit is the parity of 
+# (parity check row AND codeword).
+H3_ROWS = _pack_rows(PARITY_CHECK_3)
+H4_ROWS = _pack_rows(PARITY_CHECK_4)
+
+# The parity columns of the generator matrices (right of the identity),
+# packed the same way: parity bit j of a codeword is the parity of 
+# (message AND column j)
+(_P3_0, _P3_1, _P3_2) = _pack_rows(list(zip(*GENERATOR_3))[4:])
+(_P4_0, _P4_1, _P4_2, _P4_3) = _pack_rows(list(zip(*GENERATOR_4))[11:])
+
+
+# Depending on the format of the Generator matrix, the 
+# data bits are either in the beginning or the end of the
+# codeword. If the Generator matrix has an identity on the 
+# left side, the decoded data is at the end of the
+# codeword, if the identity is on the right the data bits 
+# are in the beginning. GENERATOR_3 and GENERATOR_4 start with
+# the identity, so decoding drops the parity bits from the end:
+# shift the codeword right by the number of parity bits.
+_DATA_SHIFT_3 = 3
+_DATA_SHIFT_4 = 4
+
+# Columns of the parity check matrices (PARITY_CHECK_*[:, i])
+PARITY_COLS_3 = tuple( tuple(PARITY_CHECK_3[j][i] for j in range(3)) for i in range(7) )
+PARITY_COLS_4 = tuple( tuple(PARITY_CHECK_4[j][i] for j in range(4)) for i in range(15) )
+
+
+def _build_syndrome_lut(parity_cols):
+    # A single flipped bit at column i of the codeword produces the i-th
+    # column of the parity check matrix as syndrome. Map every syndrome
+    # (packed into an int, first row = MSB) to the mask that flips that 
+    # bit back when XOR-ed to the codeword. The zero syndrome means 
+    # no error, its mask is 0, so the fix never needs a branch.
+    length = len(parity_cols)
+    lut = [None] * (1 << len(parity_cols[0]))
+    lut[0] = 0
+    for (i, col) in enumerate(parity_cols):
+        parity_col = 0
+        for bit in col:
+            parity_col = (parity_col << 1) | bit
+        # Column i is bit length-1-i of the codeword (the first column is the MSB)
+        lut[parity_col] = 1 << (length - 1 - i)
+    return lut
+#
+
+SYND_LUT_3 = _build_syndrome_lut(PARITY_COLS_3)
+SYND_LUT_4 = _build_syndrome_lut(PARITY_COLS_4)
+
+
+# Message x generator matrix, specialized for the two generators.
+# Both start with the identity, so the codeword is the message 
+# followed by the parity bits, each a fixed XOR of message bits.
+
+def _encode_74(message):
+    return (message << 3) \
+         | (((message & _P3_0).bit_count() & 1) << 2) \
+         | (((message & _P3_1).bit_count() & 1) << 1) \
+         | ((message & _P3_2).bit_count() & 1)
+#
+
+def _encode_1511(message):
+    return (message << 4) \
+         | (((message & _P4_0).bit_count() & 1) << 3) \
+         | (((message & _P4_1).bit_count() & 1) << 2) \
+         | (((message & _P4_2).bit_count() & 1) << 1) \
+         | ((message & _P4_3).bit_count() & 1)
+#
+
+@lru_cache(maxsize=None)
+def hamming_encode(message, length):
+    # Encoding is simply multiplying the message with the generator matrix.
+    # message is an int holding `length` (4 or 11) data bits, the
+    # result is the codeword as an int of 7 or 15 bits.
+    # There are only 16 (or 2048) possible messages, so the codewords 
+    # are cached: a GDD decompression of N bytes encodes at most that many.
+
+    if length == 4:
+        return _encode_74(message)
+
+    elif length == 11:
+        return _encode_1511(message)
 
-    generator_matrix = None
-    if len(message) == 4:
-        generator_matrix = GENERATOR_3
-        
-    elif len(message) == 11:
-        generator_matrix = GENERATOR_4
-    
     else:
         raise ValueError("Message must be 4 or 11 bits!")
-
-    return _mul_vec_mat(message, generator_matrix)
 #
 
-def hamming_decode(codeword):
+def hamming_decode(codeword, length):
     # Decode a potentially noisy codeword received after transmission
     # The result will be correct if 0 or 1 bit of the codeword is corrupted.
+    # codeword is an int holding `length` (7 or 15) bits, returns the
+    # data bits and the syndrome as ints.
 
     # Select which parity matrix to use 
-    parity_matrix = None
-    if len(codeword) == 7:
-        parity_matrix = PARITY_CHECK_3
-    elif len(codeword) == 15:
-        parity_matrix = PARITY_CHECK_4
+    parity_rows = None
+    data_shift = None
+    if length == 7:
+        parity_rows = H3_ROWS
+        data_shift = _DATA_SHIFT_3
+    elif length == 15:
+        parity_rows = H4_ROWS
+        data_shift = _DATA_SHIFT_4
     else:
         raise ValueError("Codeword must be 7 or 15 bits!")
     
-    # Generate the syndrome vector
-    syndrome = _mul_mat_vec(parity_matrix, codeword)
+    # Generate the syndrome vector: each bit is the parity of
+    # the parity check row AND-ed with the codeword (int.bit_count,
+    # Python 3.10+, counts the set bits with a single popcount)
+    syndrome = 0
+    for row in parity_rows:
+        syndrome = (syndrome << 1) | ((row & codeword).bit_count() & 1)
+
+    if syndrome == 0:
+        # No error in transmission, the codeword needs no fix
+        return (codeword >> data_shift, 0)
 
     # Find which bit was flipped using the syndrome, and flip it back
-    fixed_codeword = hamming_fix_with_syndrome(codeword, syndrome)
+    fixed_codeword = hamming_fix_with_syndrome(codeword, syndrome, length)
     
-    # Depending on the format of the Generator matrix, the 
-    # data bits are either in the beginning or the end of the
-    # codeword. If the Generator matrix has an identity on the 
-    # left side, the decoded data is at the end of the fixed 
-    # codeword, if the identity is on the right the data bits 
-    # are in the beginning
-    data_bits = fixed_codeword[:4] if GENERATOR_3[0][:4] == [1,0,0,0] else fixed_codeword[3:]
-    
-    data_bits = fixed_codeword[:4] if parity_matrix == PARITY_CHECK_3 else fixed_codeword[:11]
+    # The data bits are the beginning of the fixed codeword
+    data_bits = fixed_codeword >> data_shift
     return (data_bits, syndrome)
 #
 
-def hamming_fix_with_syndrome(codeword, syndrome):
-
+def hamming_fix_with_syndrome(codeword, syndrome, length):
 
-    if syndrome == [0,0,0] or syndrome == [0,0,0,0]:
-        # No error in transmission
-        return codeword
-    
-    # Select which parity matrix to use 
-    parity_matrix = None
-    if len(codeword) == 7:
-        parity_matrix = PARITY_CHECK_3
-    elif len(codeword) == 15:
-        parity_matrix = PARITY_CHECK_4
+    # Select which syndrome lookup table to use 
+    syndrome_lut = None
+    if length == 7:
+        syndrome_lut = SYND_LUT_3
+    elif length == 15:
+        syndrome_lut = SYND_LUT_4
     else:
         raise ValueError("Codeword must be 7 or 15 bits!")
     
-    # Find which column of the parity check matrix is identical to the syndrome
-    # TODO instead of searching for the parity column, we could precompute 
-    # a lookup table that has the correct flipped bit index for every possible syndrome
-    for i in range(len(parity_matrix[0])):
-        parity_col = [parity_matrix[j][i] for j in range(len(parity_matrix))]
-
-        if parity_col == syndrome:
-            #print("Syndrome: %s, Error bit: %d" % (syndrome, i))
-            # Flip the corresponding bit in the codeword
-            codeword[i] = 0 if codeword[i]==1 else 1
-            #print("Codeword after fix: %s" % codeword)
-            return codeword
-    
-    raise ValueError("Failed to fix codeword, no fix found for syndrome {}".format(syndrome))
+    # Flip the bit that the syndrome points to (if any)
+    return codeword ^ syndrome_lut[syndrome]
+#
+
+def _bits_to_int(bits):
+    # Pack a list of 0 and 1 into an int, first bit = MSB
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+#
+
+def _int_to_bits(value, length):
+    # Unpack an int into a list of `length` 0 and 1, MSB first
+    return [ (value >> shift) & 1 for shift in range(length - 1, -1, -1) ]
+#
+
+# Adapters for callers that work with lists of 0 and 1 
+# instead of packed ints
+
+def hamming_encode_bits(message):
+    codeword = hamming_encode(_bits_to_int(message), len(message))
+    return _int_to_bits(codeword, 7 if len(message) == 4 else 15)
+#
+
+def hamming_decode_bits(codeword):
+    (data_bits, syndrome) = hamming_decode(_bits_to_int(codeword), len(codeword))
+    if len(codeword) == 7:
+        return (_int_to_bits(data_bits, 4), _int_to_bits(syndrome, 3))
+    return (_int_to_bits(data_bits, 11), _int_to_bits(syndrome, 4))
+#
+
+def hamming_fix_with_syndrome_bits(codeword, syndrome):
+    fixed_codeword = hamming_fix_with_syndrome(_bits_to_int(codeword), _bits_to_int(syndrome), len(codeword))
+    return _int_to_bits(fixed_codeword, len(codeword))
 #
 
 def test_hamming_code(length):
@@ -181,16 +252,13 @@ def test_hamming_code(length):
 
     # Generate every possible 4-bit binary message (16 messages)
     if length == 4:
-        every_message = [ [i,j,k,l] for i in (0,1) for j in (0,1) for k in (0,1) for l in (0,1) ]
+        codeword_length = 7
+        every_message = list(range(16))
     
     elif length == 11:
+        codeword_length = 15
         # Generate a set of random 11-bit messages
-        every_message = []
-        for i in range(100):
-            message = [0] * 11
-            for b in range(len(message)):
-                message[b] = random.getrandbits(1)
-            every_message.append(message.copy())
+        every_message = [ random.getrandbits(11) for i in range(100) ]
     
     print("Messages to test: %d" % len(every_message))
 
@@ -200,35 +268,35 @@ def test_hamming_code(length):
         #print("Message to send: %s" % message)
 
         # Encode
-        message_on_wire = hamming_encode(message)
+        message_on_wire = hamming_encode(message, length)
         #print("Encoded message: %s" % message_on_wire)
         
 
         # Decode without error
         recieved = message_on_wire
-        (decoded_mes, syndrome) = hamming_decode(recieved)
+        (decoded_mes, syndrome) = hamming_decode(recieved, codeword_length)
         #print("Received message: %s" % decoded_mes)
         if not decoded_mes == message:
-            print("Error decoding without error %s. Syndrome: %s Decoded message: %s" % (message, syndrome, decoded_mes))
+            print("Error decoding without error %s. Syndrome: %s Decoded message: %s" % (_int_to_bits(message, length), _int_to_bits(syndrome, codeword_length - length), _int_to_bits(decoded_mes, length)))
             
         # Corrupt each bit and try to decode
-        for bit_idx in range(len(message_on_wire)):
-            # Make a copy of the codeword before corrupting it 
-            recieved = message_on_wire.copy()
-            recieved[bit_idx] = 1 if recieved[bit_idx] == 0 else 0
+        for bit_idx in range(codeword_length):
+            # Codewords are ints, flipping a bit makes a new one 
+            # and leaves message_on_wire intact, no copy needed
+            recieved = message_on_wire ^ (1 << bit_idx)
         
             # Decode
             #print("Received codeword: %s" % recieved)
-            (decoded_mes, syndrome) = hamming_decode(recieved.copy())
+            (decoded_mes, syndrome) = hamming_decode(recieved, codeword_length)
             #print("Received message: %s" % decoded_mes)
             if not decoded_mes == message:
-                print("Error with %s when bit %d is flipped" % (message, bit_idx))
+                print("Error with %s when bit %d is flipped" % (_int_to_bits(message, length), codeword_length - 1 - bit_idx))
             else:
                 pass
                 #print("Message %s corrected when bit %d is flipped"  % (message, bit_idx))
                 #print("%s message = %s base + %s syndrome" % (recieved, decoded_mes, syndrome))
 
-        print("Message corrected successfully: %s" % message)
+        print("Message corrected successfully: %s" % _int_to_bits(message, length))
 
     print("Every possible 4-bit message with 1 bit error was corrected.")
 
@@ -1,201 +1,200 @@
-
-from hamming import hamming_encode, hamming_decode, hamming_fix_with_syndrome
+from array import array
+from hamming import H4_ROWS, SYND_LUT_3, SYND_LUT_4, hamming_decode, hamming_encode
+import mmap
 import random
-
-def _byte_to_bitlist(byte):
-    # convert to a list of bits
-    bitlist = [ int(i) for i in list('{0:0b}'.format(byte))]
-    # pad the front with zeroes until it's length is 8
-    while len(bitlist) < 8:
-        bitlist.insert(0, 0)
-    
-    return bitlist
+import sys
+
+# Compressed data format
+# ----------------------
+# Both compressors return the distinct bases in order of first appearance
+# (base_table, a list of ints), the index of the base of every input 
+# byte (or byte pair) in base_table (base_ids) and the deviation of every
+# input byte (or byte pair) packed into one byte (deviations): the syndrome
+# bits followed by the carried over last bit of the input, i.e. 
+# (syndrome << 1) | carry. Only the distinct bases are stored in full, 
+# the ids play the role of "pointers" to them.
+
+def _build_gdd_74_tables():
+    # Hamming(7,4) GDD of a byte only depends on the byte value, so 
+    # precompute the base and the deviation of all 256 possible bytes.
+    # The first 7 bits of the byte are the codeword, the deviation is
+    # the 3-bit syndrome followed by the carried over last bit.
+    base_table = bytearray(256)
+    dev_table = bytearray(256)
+    for byte in range(256):
+        (base, syndrome) = hamming_decode(byte >> 1, 7)
+        base_table[byte] = base
+        dev_table[byte] = (syndrome << 1) | (byte & 1)
+    return (bytes(base_table), bytes(dev_table))
 #
 
-def _bitlist_to_byte(bitlist):
-    assert len(bitlist) == 8
-    byte = 0
-    # Reverse bitlist so we can iterate from LSB to MSB
-    list_reversed = bitlist[::-1]
-    for (idx, bit) in enumerate(list_reversed):
-        if bit:
-            # For each nonzero bit, add the current power of 2 to the result
-            byte = byte + pow(2, idx)
-    
-    return byte
+(_BASE_TABLE_74, _DEV_TABLE_74) = _build_gdd_74_tables()
+
+def _build_gdd_74_decode_table():
+    # The inverse: the original byte of every (base << 4) | deviation.
+    # GDD decode = Hamming encode the base, then apply the syndrome 
+    # (same process as the second half of Hamming decode)
+    decode_table = bytearray(256)
+    for base in range(16):
+        codeword = hamming_encode(base, 4)
+        for dev in range(16):
+            decode_table[(base << 4) | dev] = ((codeword ^ SYND_LUT_3[dev >> 1]) << 1) | (dev & 1)
+    return bytes(decode_table)
 #
 
+_DECODE_TABLE_74 = _build_gdd_74_decode_table()
+
+# Process the input in chunks of this many bytes, so the intermediate
+# per-chunk buffers stay small (and cache resident) even for huge inputs
+_CHUNK_SIZE = 256 * 1024
+
 def gdd_hamming_74_compress(data):
     """
     Compress the passed list of bytes 
+    (any bytes-like object, e.g. bytes, a memoryview of an mmap).
+    Returns (base_table, base_ids, deviations), base_ids and deviations
+    are bytes with one entry per input byte.
     """ 
 
-    bases = []
-    deviations = [] 
+    base_table = []
+    base_ids = bytearray()
+    deviations = bytearray()
+    # Id (index in base_table) of each of the 16 possible bases
+    id_table = bytearray(256)
 
     # Hamming(7,4) operates on 7 bits at once, 
     # process the data in bytes and use the first 7 bits
     # of each byte. Carry over the last bit into the deviation.
-    for byte in data:
-        # Convert the next byte to binary form, a list of 0 and 1 (hamming coder expects this format)
-        bitlist = _byte_to_bitlist(byte)
-        #print("%d -> %s" % (byte, bitlist))
-        # Run a Hamming decoder on the next 7-bit section of the input data
-        (base, deviation) = hamming_decode(bitlist[:7])
-        #print("Base and deviation of byte %s: %s, %s" % (bitlist[:7], base, deviation) )
-
-        # Check if the base is already known. 
+    for start in range(0, len(data), _CHUNK_SIZE):
+        chunk = bytes(data[start:start + _CHUNK_SIZE])
+
+        # Look up the base of every byte in the chunk at once.
+        base_bytes = chunk.translate(_BASE_TABLE_74)
+
+        # Find the bases that show up for the first time in this chunk,
+        # and give them the next ids in order of appearance
+        new_bases = []
+        for base in range(16):
+            if base not in base_table:
+                idx = base_bytes.find(base)
+                if idx >= 0:
+                    new_bases.append((idx, base))
+        for (idx, base) in sorted(new_bases):
+            id_table[base] = len(base_table)
+            base_table.append(base)
+
+        # Store only the id of the base of every byte.
         # This is the actual compression
-        try:
-            # Base already in bases at base_idx
-            base_idx = bases.index(base)
-            # Store only the index ("pointer") to the existing base
-            bases.append(base_idx)
-        except ValueError:
-            # New base, not found in bases. 
-            # Store the whole base 
-            bases.append(base)
-
-        # Carry over the last bit of the byte into the deviation
-        deviation.append(bitlist[7])
-        # Store the full deviation  
-        deviations.append(deviation)
-    # Finished processing every byte
-
-    return (bases, deviations)
+        base_ids += base_bytes.translate(id_table)
+        deviations += chunk.translate(_DEV_TABLE_74)
+    # Finished processing every chunk
+
+    return (base_table, bytes(base_ids), bytes(deviations))
+#
+
+def _compress_1511_core(data):
+    """
+    Single pass Hamming(15,11) GDD over an even long sequence of bytes,
+    working on packed ints only. Every byte pair is a 16-bit word: the
+    first 15 bits are Hamming decoded and the last bit is carried over. 
+    Returns the distinct bases in order of appearance, the index of the 
+    base of every byte pair in that list, and the deviations 
+    (4-bit syndrome followed by the carry-over bit).
+    """
+
+    (h0, h1, h2, h3) = H4_ROWS
+
+    base_table = []
+    # There are at most 2048 distinct 11-bit bases, ids fit into 16 bits
+    base_ids = array('H')
+    deviations = bytearray()
+    # Index of every known base in base_table
+    seen = {}
+
+    # View the data as 16-bit words in one go, first byte = high byte
+    words = array('H')
+    words.frombytes(data)
+    if sys.byteorder == 'little':
+        words.byteswap()
+
+    for word in words:
+        codeword = word >> 1
+
+        # Syndrome: parity of every parity check row AND-ed with the codeword
+        syndrome = (((h0 & codeword).bit_count() & 1) << 3) \
+                 | (((h1 & codeword).bit_count() & 1) << 2) \
+                 | (((h2 & codeword).bit_count() & 1) << 1) \
+                 | ((h3 & codeword).bit_count() & 1)
+
+        # Flip back the bit the syndrome points to
+        # (valid codewords, syndrome 0, need no fix)
+        if syndrome:
+            codeword ^= SYND_LUT_4[syndrome]
+
+        # The data bits are the first 11 bits of the fixed codeword
+        base = codeword >> 4
+        base_id = seen.get(base)
+        if base_id is None:
+            base_id = seen[base] = len(base_table)
+            base_table.append(base)
+        
+        base_ids.append(base_id)
+        deviations.append((syndrome << 1) | (word & 1))
+
+    return (base_table, base_ids, bytes(deviations))
 #
 
 def gdd_hamming_1511_compress(data):
+    """
+    Compress the passed list of bytes using Hamming(15,11).
+    Returns (is_odd, base_table, base_ids, deviations), base_ids (an 
+    array of uint16) and deviations have one entry per byte pair.
+    """
 
-    bases = []
-    deviations = []
-    
     is_odd = (len(data) % 2 != 0)
     if is_odd:
         # Append an extra byte to the data, so it's even long
         data = bytearray(data)
         data.append(0)
     
-    current_bytes = []
     # Process the data in byte pairs (16 bits), out of which
     # we Hamming code the first 15 and carry over the last as 
     # part of the deviation
-    for byte in data:
-        # Convert to bitlist
-        bitlist = _byte_to_bitlist(byte)
-        
-        if not current_bytes:
-            # New byte, start with it
-            current_bytes = bitlist.copy()
-            # Jump to the next byte
-            # (we padded odd length data, there must be a next byte)
-            continue
-        
+    (base_table, base_ids, deviations) = _compress_1511_core(data)
 
-        # This is the second byte, append the bits of this one
-        # to the current_bytes buffer
-        for bit in bitlist:
-            current_bytes.append(bit)
-        
-        # Run a Hamming decoder on the next 11-bit section of the input data
-        (base, deviation) = hamming_decode(current_bytes[:15])
-
-        # Check if the base is already known. 
-        # This is the actual compression
-        try:
-            # Base already in bases at base_idx
-            base_idx = bases.index(base)
-            # Store only the index ("pointer") to the existing base
-            bases.append(base_idx)
-        except ValueError:
-            # New base, not found in bases. 
-            # Store the whole base 
-            bases.append(base)
-
-        # Carry over the last bit of the byte into the deviation
-        deviation.append(current_bytes[15])
-        # Store the full deviation  
-        deviations.append(deviation)
-
-        # Reset current byte
-        current_bytes = [] 
-    #
-    return (is_odd, bases, deviations)
-    #
+    return (is_odd, base_table, base_ids, deviations)
 #
 
 
 
-def gdd_hamming_74_decompress(bases, deviations):
+def gdd_hamming_74_decompress(base_table, base_ids, deviations):
     
-    reconstructed_bytes = []
-    for (idx, base) in enumerate(bases):
-        # If the current base is a "pointer" to a full base, load it
-        full_base = base if isinstance(base, list) else bases[base]
-        # This deviation belongs to the current base 
-        dev = deviations[idx]
-        
-        # Cut off the last bit, which is the carry-over last bit of the original input byte
-        carryover_bit = dev[3]
-        dev = dev[0:3]
-
-        # GDD decode = Hamming encode
-        bitlist = hamming_encode(full_base)
-         
-        # Apply the syndrome to recover the original bitlist 
-        # (same process as the second half of Hamming decode)
-        bitlist = hamming_fix_with_syndrome(bitlist, dev)
-
-        # Append the carry-over bit
-        bitlist.append(carryover_bit)
-        #print("Reconstructed bitlist: %s" % bitlist)
-
-        # Convert back from bitlist to byte
-        current_byte = _bitlist_to_byte(bitlist)
-        #print("Byte: %d" % reconstructed_byte)
-        reconstructed_bytes.append(current_byte)
-    
-    # Done reconstructing the whole data
-    return bytes(reconstructed_bytes)
+    # Original byte for every (id << 4) | deviation
+    byte_table = bytes( _DECODE_TABLE_74[(base << 4) | dev] for base in base_table for dev in range(16) ).ljust(256, b'\0')
 
+    # Merge every id with its deviation into (id << 4) | deviation in 
+    # one go: reading both sequences as big ints, the ids (< 16) shifted 
+    # by 4 bits don't overflow into their neighbour bytes
+    keys = ((int.from_bytes(base_ids, 'big') << 4) | int.from_bytes(deviations, 'big')).to_bytes(len(base_ids), 'big')
 
-def gdd_hamming_1511_decompress(bases, deviations, is_padded):
-    
-    reconstructed_bytes = []
-    for (idx, base) in enumerate(bases):
-        # If the current base is a "pointer" to a full base, load it
-        full_base = base if isinstance(base, list) else bases[base]
-        # This deviation belongs to the current base 
-        dev = deviations[idx]
-        
-        # Cut off the last bit, which is the carry-over last bit of the original input byte
-        carryover_bit = dev[4]
-        dev = dev[0:4]
-
-        assert len(dev) == 4, "Deviation should be 4 bits, instead found {} bits".format(len(dev))
-
-        # GDD decode = Hamming encode
-        bitlist = hamming_encode(full_base)
-
-        assert len(bitlist) == 15
-         
-        # Apply the syndrome to recover the original bitlist 
-        # (same process as the second half of Hamming decode)
-        bitlist = hamming_fix_with_syndrome(bitlist, dev)
-
-        # Append the carry-over bit
-        bitlist.append(carryover_bit)
-
-        assert len(bitlist) == 16
-
-        # Convert back from bitlist to byte
-        byte1 = _bitlist_to_byte(bitlist[:8])
-        reconstructed_bytes.append(byte1)
-        
+    # Done reconstructing the whole data
+    return keys.translate(byte_table)
 
-        byte2 = _bitlist_to_byte(bitlist[8:])
-        reconstructed_bytes.append(byte2)
 
+def gdd_hamming_1511_decompress(base_table, base_ids, deviations, is_padded):
+    
+    # GDD decode = Hamming encode
+    codewords = [ hamming_encode(base, 11) for base in base_table ]
+
+    # Apply the syndrome to recover the original 15 bits 
+    # (same process as the second half of Hamming decode)
+    # and append the carry-over bit
+    words = array('H', [ ((codewords[base_id] ^ SYND_LUT_4[dev >> 1]) << 1) | (dev & 1) for (base_id, dev) in zip(base_ids, deviations) ])
+
+    # Every word is two bytes of the original data, first byte = high byte
+    if sys.byteorder == 'little':
+        words.byteswap()
+    reconstructed_bytes = words.tobytes()
     
     # Done reconstructing the whole data
 
@@ -203,7 +202,7 @@ def gdd_hamming_1511_decompress(bases, deviations, is_padded):
        # Cut off the last byte, which is a padding
        reconstructed_bytes = reconstructed_bytes[:-1]
 
-    return bytes(reconstructed_bytes)
+    return reconstructed_bytes
 
 
 def test_compress_7_4(file_contents):
@@ -213,18 +212,13 @@ def test_compress_7_4(file_contents):
     ratio to the console.
     """
 
-    (bases, devs) = gdd_hamming_74_compress(file_contents)
+    (base_table, base_ids, devs) = gdd_hamming_74_compress(file_contents)
     print("Compression ready")
 
     # Compute the compression ratio (compressed size / orig size)
-    compressed_size_bits = len(devs) * len(devs[0])
-    for b in bases:
-        if isinstance(b, list):
-            # Full base
-            compressed_size_bits = compressed_size_bits + len(b)
-        else:
-            # Pointer to an existing base
-            compressed_size_bits += 0
+    # 4 bits per deviation (3-bit syndrome + carry-over bit) and
+    # 4 bits per full base, pointers to existing bases are not counted
+    compressed_size_bits = len(devs) * 4 + len(base_table) * 4
     
     # Original data size in bits
     orig_size_bits = len(file_contents) * 8
@@ -232,7 +226,7 @@ def test_compress_7_4(file_contents):
     print("Compression: %d -> %d bits, %lf percent size reduction" % (orig_size_bits, compressed_size_bits, (100-(100*compressed_size_bits/orig_size_bits))))
     
     # Decompress
-    reconstructed = gdd_hamming_74_decompress(bases, devs)
+    reconstructed = gdd_hamming_74_decompress(base_table, base_ids, devs)
 
     #print("Decompression ready")
     #print("Decompressed data: \n%s" % reconstructed)
@@ -252,10 +246,10 @@ def test_compress_15_11(data):
     """
 
     # Compress
-    (is_padded, bases, devs) = gdd_hamming_1511_compress(data)
+    (is_padded, base_table, base_ids, devs) = gdd_hamming_1511_compress(data)
 
     # Decompress
-    reconstructed = gdd_hamming_1511_decompress(bases, devs, is_padded)
+    reconstructed = gdd_hamming_1511_decompress(base_table, base_ids, devs, is_padded)
 
     if reconstructed != data:
         print("Error! Reconstructed data is different than original!")
@@ -263,14 +257,9 @@ def test_compress_15_11(data):
         print("Correct decompression!")
 
     # Compute the compression ratio (compressed size / orig size)
-    compressed_size_bits = len(devs) * len(devs[0])
-    for b in bases:
-        if isinstance(b, list):
-            # Full base
-            compressed_size_bits = compressed_size_bits + len(b)
-        else:
-            # Pointer to an existing base
-            compressed_size_bits += 0
+    # 5 bits per deviation (4-bit syndrome + carry-over bit) and
+    # 11 bits per full base, pointers to existing bases are not counted
+    compressed_size_bits = len(devs) * 5 + len(base_table) * 11
     
     # Original data size in bits
     orig_size_bits = len(data) * 8
@@ -284,8 +273,10 @@ def test_compress_15_11(data):
 if __name__ == "__main__":
     
     def _readfile(filepath):
+        # Map the file into memory instead of reading it, pages are
+        # loaded by the OS as the compressors go through the data
         with open(filepath, "rb") as f:
-            return f.read()
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
     #
 
     file_contents = _readfile("test_files/sample2.pdf")